@@ -1,45 +1,60 @@
 from fastapi import HTTPException
-from app.models.models import UserAnalysisResult, CollaborationResult, CollaborationOption, UserContribution
+from fastapi.concurrency import run_in_threadpool
+from app.models.models import (
+    UserAnalysisResult, BuildPlanResult, CollaborationResult, CollaborationOption, UserContribution
+)
 from app.functions.functions import (
     get_user_inventory, get_all_sets, get_set_requirements, can_build_set, 
-    get_all_users, get_set_by_id, get_all_colors, calculate_user_contribution
+    get_all_users, get_set_by_id, get_all_colors, calculate_user_contribution,
+    iter_requirement_rows, select_compatible_sets, get_all_set_requirements
 )
 from itertools import combinations
 
 
+async def classify_user_sets(inventory):
+    """Split the catalogue into sets buildable on their own and the rest.
+
+    Returns the total set count, buildable (set_data, requirements) pairs and
+    unbuildable set_data dicts.
+    """
+    sets_response = await get_all_sets()
+    sets = sets_response.Sets
+    all_requirements = await get_all_set_requirements(sets)
+    buildable = []
+    unbuildable = []
+    
+    # Check each set against user's inventory
+    for s, (requirements, set_name) in zip(sets, all_requirements):
+        set_data = {
+            'id': s.id,
+            'name': set_name,
+            'pieces': s.totalPieces,
+            'set_number': s.setNumber
+        }
+        
+        # Categorize as buildable or not
+        if can_build_set(inventory, requirements):
+            buildable.append((set_data, requirements))
+        else:
+            unbuildable.append(set_data)
+    
+    return len(sets), buildable, unbuildable
+
+
 async def analyze_user_builds(username: str) -> UserAnalysisResult:
     """Analyze which sets a user can build with their collection"""
     try:
         # Get user's piece inventory
         inventory = await get_user_inventory(username)
-        sets_response = await get_all_sets()
-        sets = sets_response.Sets
-        buildable = []
-        unbuildable = []
-        
-        # Check each set against user's inventory
-        for s in sets:
-            set_id = s.id
-            requirements, set_name = await get_set_requirements(set_id)
-            set_data = {
-                'id': set_id,
-                'name': set_name,
-                'pieces': s.totalPieces,
-                'set_number': s.setNumber
-            }
-            
-            # Categorize as buildable or not
-            if can_build_set(inventory, requirements):
-                buildable.append(set_data)
-            else:
-                unbuildable.append(set_data)
+        total_sets, buildable, unbuildable = await classify_user_sets(inventory)
+        buildable = [set_data for set_data, _ in buildable]
         
         # Compile results with statistics
         result_data = {
             'username': username,
             'total_pieces': sum(inventory.values()),
             'unique_combinations': len(inventory),
-            'total_sets': len(sets),
+            'total_sets': total_sets,
             'buildable_sets': sorted(buildable, key=lambda x: x['pieces']),
             'buildable_count': len(buildable),
             'unbuildable_sets': sorted(unbuildable, key=lambda x: x['pieces']),
@@ -52,6 +67,42 @@ async def analyze_user_builds(username: str) -> UserAnalysisResult:
         raise HTTPException(status_code=404, detail=f"User '{username}' not found or API error: {str(e)}")
 
 
+async def plan_simultaneous_builds(username: str, objective: str = "sets", time_budget: float = 2.0) -> BuildPlanResult:
+    """Find a combination of sets the user can build at the same time without sharing pieces"""
+    try:
+        # Get user's piece inventory
+        inventory = await get_user_inventory(username)
+        
+        # Only sets buildable on their own are candidates for the plan
+        _, buildable, _ = await classify_user_sets(inventory)
+        candidates = [set_data for set_data, _ in buildable]
+        candidate_requirements = [requirements for _, requirements in buildable]
+        
+        # Maximize either the number of sets or the total pieces used
+        if objective == "sets":
+            values = [1] * len(candidates)
+        else:
+            values = [c['pieces'] for c in candidates]
+        # The search is CPU-bound, keep it off the event loop
+        chosen, optimal = await run_in_threadpool(
+            select_compatible_sets, inventory, candidate_requirements, values, time_budget
+        )
+        planned = sorted((candidates[i] for i in chosen), key=lambda x: x['pieces'])
+        
+        return BuildPlanResult(
+            username=username,
+            objective=objective,
+            candidate_count=len(candidates),
+            planned_sets=planned,
+            planned_count=len(planned),
+            planned_pieces=sum(p['pieces'] for p in planned),
+            optimal=optimal
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"User '{username}' not found or API error: {str(e)}")
+
+
 async def analyze_set_build(set_id: str, username: str):
     """Analyze detailed piece requirements for building a specific set"""
     try:
@@ -64,37 +115,25 @@ async def analyze_set_build(set_id: str, username: str):
         colors_response = await get_all_colors()
         color_lookup = {str(color.code): color.name for color in colors_response.colours}
         
-        # Build detailed requirements list with availability
-        requirements = []
+        # Tally missing pieces for statistics
         can_build_all = True
         total_missing_pieces = 0
         missing_piece_types = 0
         
-        for (piece_id, color_id), needed in requirements_dict.items():
-            user_has = inventory.get((piece_id, color_id), 0)
-            missing = max(0, needed - user_has)
-            
-            # Track missing pieces for statistics
+        for key, needed in requirements_dict.items():
+            user_has = inventory.get(key, 0)
             if user_has < needed:
                 can_build_all = False
                 missing_piece_types += 1
-                total_missing_pieces += missing
-            
-            requirements.append({
-                'piece_id': piece_id,
-                'color_id': color_id,
-                'color_name': color_lookup.get(color_id, None),
-                'needed': needed,
-                'user_has': user_has,
-                'missing': missing
-            })
+                total_missing_pieces += needed - user_has
         
-        # Sort by availability (insufficient pieces first)
-        requirements.sort(key=lambda x: (x['user_has'] >= x['needed'], x['piece_id']))
+        # Requirement rows are generated while the page streams (insufficient pieces first)
+        requirements = iter_requirement_rows(inventory, requirements_dict, color_lookup)
         
         return {
             'set_info': set_info,
             'requirements': requirements,
+            'unique_parts': len(requirements_dict),
             'can_build': can_build_all,
             'username': username,
             'missing_piece_types': missing_piece_types,
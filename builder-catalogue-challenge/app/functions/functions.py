@@ -1,5 +1,8 @@
+from bisect import bisect_left
 from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+import asyncio
+import time
 import httpx
 from app.models.models import (
     UsersResponse, UserSummary, UserFull,
@@ -10,6 +13,17 @@ from app.models.models import (
 # External API base URL
 API_BASE = "https://d30r5p5favh3z8.cloudfront.net"
 
+# How long the cached user/set catalogue and its lookup indexes stay fresh (seconds)
+CATALOGUE_TTL = 300.0
+# After a failed rebuild, wait this long before fetching the catalogue again (seconds)
+CATALOGUE_RETRY_BACKOFF = 30.0
+_catalogue_cache = {}
+_catalogue_failures = {}
+_catalogue_locks = defaultdict(asyncio.Lock)
+
+# Upper limit on set requirement requests in flight at once
+MAX_CONCURRENT_SET_FETCHES = 20
+
 
 async def get_json(url: str) -> dict:
     """Make async HTTP request to external API"""
@@ -35,6 +49,13 @@ async def get_all_users() -> UsersResponse:
 
 async def get_user_by_username(username: str) -> UserSummary:
     """Get user summary by username"""
+    # Resolve locally when the user is in the cached catalogue
+    try:
+        user = (await get_user_index())['by_username'].get(username)
+    except Exception:
+        user = None  # Catalogue unavailable, ask the API directly
+    if user is not None:
+        return user
     response_data = await get_json(f"{API_BASE}/api/user/by-username/{username}")
     return UserSummary(**response_data)
 
@@ -55,6 +76,13 @@ async def get_all_sets() -> SetsResponse:
 
 async def get_set_by_name(name: str) -> SetSummary:
     """Get set summary by name"""
+    # Resolve locally when the set is in the cached catalogue
+    try:
+        set_summary = (await get_set_index())['by_name'].get(name)
+    except Exception:
+        set_summary = None  # Catalogue unavailable, ask the API directly
+    if set_summary is not None:
+        return set_summary
     response_data = await get_json(f"{API_BASE}/api/set/by-name/{name}")
     return SetSummary(**response_data)
 
@@ -72,6 +100,99 @@ async def get_all_colors() -> ColorsResponse:
     response_data = await get_json(f"{API_BASE}/api/colours")
     return ColorsResponse(**response_data)
 
+# =============================================================================
+# Cached catalogue and prefix indexes
+# =============================================================================
+def build_prefix_index(entries: List[Tuple[str, object]]) -> list:
+    """Build a case-insensitive prefix lookup over (key, item) pairs"""
+    return sorted(((key.lower(), key, item) for key, item in entries), key=lambda entry: entry[:2])
+
+
+def build_exact_index(entries: List[Tuple[str, object]]) -> dict:
+    """Map each key to the first item that has it"""
+    exact = {}
+    for key, item in entries:
+        exact.setdefault(key, item)
+    return exact
+
+
+def search_prefix_index(index: dict, prefix: str, limit: int = 10) -> list:
+    """Return up to limit distinct items whose key starts with prefix"""
+    prefix = prefix.lower()
+    keys = index['prefix']
+    matches = []
+    # Keys sharing a prefix are contiguous in the sorted list
+    for pos in range(bisect_left(keys, (prefix,)), len(keys)):
+        lowered, _, item = keys[pos]
+        if len(matches) >= limit or not lowered.startswith(prefix):
+            break
+        if not any(item is match for match in matches):
+            matches.append(item)
+    return matches
+
+
+async def get_cached_index(name: str, build) -> dict:
+    """Return a cached index, rebuilding it once CATALOGUE_TTL has passed.
+
+    A failed rebuild keeps serving the stale index if there is one, and further
+    attempts are skipped for CATALOGUE_RETRY_BACKOFF so callers fail fast.
+    """
+    def is_fresh(entry):
+        return entry is not None and time.monotonic() - entry[0] <= CATALOGUE_TTL
+    
+    def backing_off():
+        failed_at = _catalogue_failures.get(name)
+        return failed_at is not None and time.monotonic() - failed_at < CATALOGUE_RETRY_BACKOFF
+    
+    cached = _catalogue_cache.get(name)
+    if is_fresh(cached):
+        return cached[1]
+    if not backing_off():
+        # Concurrent callers wait for a single rebuild instead of each fetching
+        async with _catalogue_locks[name]:
+            cached = _catalogue_cache.get(name)
+            if is_fresh(cached):
+                return cached[1]
+            if not backing_off():
+                try:
+                    cached = (time.monotonic(), await build())
+                except Exception:
+                    _catalogue_failures[name] = time.monotonic()
+                    if cached is None:
+                        raise
+                    return cached[1]
+                _catalogue_cache[name] = cached
+                _catalogue_failures.pop(name, None)
+                return cached[1]
+    if cached is None:
+        raise RuntimeError(f"The {name} catalogue is unavailable, retrying in a moment")
+    return cached[1]
+
+
+async def get_user_index() -> dict:
+    """Prefix index over usernames from the cached user catalogue"""
+    async def build():
+        users_response = await get_all_users()
+        entries = [(user.username, user) for user in users_response.Users]
+        return {
+            'by_username': build_exact_index(entries),
+            'prefix': build_prefix_index(entries)
+        }
+    return await get_cached_index('users', build)
+
+
+async def get_set_index() -> dict:
+    """Prefix index over set names and set numbers from the cached set catalogue"""
+    async def build():
+        sets_response = await get_all_sets()
+        by_name = [(s.name, s) for s in sets_response.Sets]
+        by_number = [(s.setNumber, s) for s in sets_response.Sets]
+        return {
+            'by_name': build_exact_index(by_name),
+            'prefix': build_prefix_index(by_name + by_number)
+        }
+    return await get_cached_index('sets', build)
+
 # =============================================================================
 # Utility functions for analysis
 # =============================================================================
@@ -108,6 +229,17 @@ async def get_set_requirements(set_id: str) -> Tuple[Dict[Tuple[str, str], int],
     return requirements, set_data.name
 
 
+async def get_all_set_requirements(sets) -> List[Tuple[Dict[Tuple[str, str], int], str]]:
+    """Get piece requirements for many sets concurrently, in the order given"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SET_FETCHES)
+    
+    async def fetch(set_id):
+        async with semaphore:
+            return await get_set_requirements(set_id)
+    
+    return await asyncio.gather(*(fetch(s.id) for s in sets))
+
+
 def can_build_set(inventory: Dict[Tuple[str, str], int], requirements: Dict[Tuple[str, str], int]) -> bool:
     """Check if user has sufficient pieces to build a set"""
     for key, needed in requirements.items():
@@ -116,6 +248,97 @@ def can_build_set(inventory: Dict[Tuple[str, str], int], requirements: Dict[Tupl
     return True
 
 
+def select_compatible_sets(
+    inventory: Dict[Tuple[str, str], int],
+    candidates: List[Dict[Tuple[str, str], int]],
+    values: List[int],
+    time_budget: float = 2.0
+) -> Tuple[List[int], bool]:
+    """Pick candidate sets that can all be built at once, maximizing total value.
+
+    Multi-dimensional knapsack over (piece_id, color_id) requirements: a greedy
+    pass seeds the best plan, then branch and bound improves it until the search
+    space is exhausted or the time budget runs out. Candidates must each be
+    buildable on their own. Returns the chosen candidate indices and whether
+    the plan is proven optimal.
+    """
+    # Scarcity-weighted cost: pieces the user owns few of count for more
+    costs = [
+        sum(needed / inventory[key] for key, needed in req.items() if needed)
+        for req in candidates
+    ]
+    indices = sorted(range(len(candidates)), key=lambda i: (-values[i], costs[i]))
+    
+    remaining = dict(inventory)
+    
+    def fits(i):
+        return all(remaining.get(key, 0) >= needed for key, needed in candidates[i].items())
+    
+    def take(i, sign):
+        for key, needed in candidates[i].items():
+            remaining[key] = remaining.get(key, 0) - sign * needed
+    
+    # Greedy pass by value per unit of scarce pieces used
+    best = []
+    for i in sorted(indices, key=lambda i: -values[i] / (costs[i] or 1)):
+        if fits(i):
+            take(i, 1)
+            best.append(i)
+    best_value = sum(values[i] for i in best)
+    for i in best:
+        take(i, -1)
+    
+    deadline = time.monotonic() + time_budget
+    chosen = []
+    timed_out = False
+    
+    def search(pos, value):
+        nonlocal best, best_value, timed_out
+        if value > best_value:
+            best, best_value = list(chosen), value
+        if timed_out or time.monotonic() > deadline:
+            timed_out = True
+            return
+        # Upper bound: every remaining set that still fits on its own
+        rest = [p for p in range(pos, len(indices)) if fits(indices[p])]
+        bound = value + sum(values[indices[p]] for p in rest)
+        for p in rest:
+            if bound <= best_value:
+                return
+            i = indices[p]
+            take(i, 1)
+            chosen.append(i)
+            search(p + 1, value + values[i])
+            chosen.pop()
+            take(i, -1)
+            if timed_out:
+                return
+            # Skipping this set removes its value from the bound
+            bound -= values[i]
+    
+    search(0, 0)
+    return sorted(best), not timed_out
+
+
+def iter_requirement_rows(inventory: Dict[Tuple[str, str], int], requirements: Dict[Tuple[str, str], int], color_lookup=None):
+    """Yield per-piece requirement rows, insufficient pieces first"""
+    # Sort keys only, rows are built lazily as the page is rendered
+    ordered = sorted(
+        requirements.items(),
+        key=lambda item: (inventory.get(item[0], 0) >= item[1], item[0][0])
+    )
+    for (piece_id, color_id), needed in ordered:
+        user_has = inventory.get((piece_id, color_id), 0)
+        yield {
+            'piece_id': piece_id,
+            'color_id': color_id,
+            'color_name': color_lookup.get(color_id, None) if color_lookup else None,
+            'needed': needed,
+            'user_has': user_has,
+            'missing': max(0, needed - user_has)
+        }
+
+
 async def get_users_list():
     """Get list of all users"""
     users_response = await get_all_users()
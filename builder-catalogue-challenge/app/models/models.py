@@ -66,6 +66,11 @@ class SetFull(BaseModel): # Full set info including pieces
 class SetsResponse(BaseModel): # Response model for all sets
     Sets: List[SetSummary]
 
+class AutocompleteResponse(BaseModel): # Prefix matches for usernames and sets
+    query: str
+    users: List[UserSummary]
+    sets: List[SetSummary]
+
 # =============================================================================
 # Color-related models
 # =============================================================================
@@ -98,6 +103,15 @@ class UserAnalysisResult(BaseModel): # Analysis result for a user's buildable se
     unbuildable_sets: List[BuildableSet]
     unbuildable_count: int
 
+class BuildPlanResult(BaseModel): # Sets a user can build at the same time without sharing pieces
+    username: str
+    objective: str
+    candidate_count: int
+    planned_sets: List[BuildableSet]
+    planned_count: int
+    planned_pieces: int
+    optimal: bool
+
 # =============================================================================
 # Collaboration models
 # =============================================================================
@@ -1,19 +1,79 @@
-from fastapi import APIRouter, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse
+from typing import Literal
+from fastapi import APIRouter, Request, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from markupsafe import escape
 from app.models.models import (
-    UserAnalysisResult, UsersResponse, UserSummary, UserFull,
-    SetsResponse, SetSummary, SetFull, ColorsResponse, CollaborationResult
+    UserAnalysisResult, BuildPlanResult, UsersResponse, UserSummary, UserFull,
+    SetsResponse, SetSummary, SetFull, ColorsResponse, CollaborationResult,
+    AutocompleteResponse
+)
+from app.controllers.controller import (
+    analyze_user_builds, plan_simultaneous_builds, analyze_set_build, find_collaboration_partners
 )
-from app.controllers.controller import analyze_user_builds, analyze_set_build, find_collaboration_partners
 from app.functions.functions import (
     get_all_users, get_user_by_username, get_user_by_id,
-    get_all_sets, get_set_by_name, get_set_by_id, get_all_colors
+    get_all_sets, get_set_by_name, get_set_by_id, get_all_colors,
+    get_user_index, get_set_index, search_prefix_index
 )
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+
+# Upper limit in seconds for the build planner's search
+MAX_PLAN_TIME_BUDGET = 10.0
+
+# Rendered output is grouped into chunks of roughly this many characters, so a
+# large page is not sent as thousands of tiny pieces
+STREAM_CHUNK_SIZE = 8192
+
+# base.html opens <main> right after the shared <head> and .header banner, so
+# everything up to it is flushed as the first chunk
+HEADER_END_MARKER = "<main>"
+
+
+def iter_template_chunks(chunks):
+    """Group Jinja's output into larger chunks and report errors inline"""
+    buffer = []
+    size = 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+    except Exception as e:
+        # Headers are already sent, so the error can only be shown in the page
+        buffer.append(f'<div class="error"><strong>Error:</strong> {escape(str(e))}</div>')
+    yield "".join(buffer)
+
+
+def stream_template(name: str, context: dict) -> StreamingResponse:
+    """Render a template chunk by chunk so the page header is sent immediately.
+
+    Only rendering is streamed: callers still await their data first, so a
+    failed analysis can be shown with error.html and a proper status code.
+    """
+    chunks = templates.get_template(name).generate(context)
+    head = []
+    try:
+        # Render the shared header eagerly so early template errors surface here
+        for chunk in chunks:
+            head.append(chunk)
+            if HEADER_END_MARKER in chunk:
+                break
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering page: {str(e)}")
+
+    def body():
+        yield "".join(head)
+        yield from iter_template_chunks(chunks)
+
+    return StreamingResponse(body(), media_type="text/html")
+
 # =============================================================================
 # Frontend Routes
 # =============================================================================
@@ -21,19 +81,8 @@ templates = Jinja2Templates(directory="templates")
 @router.get("/", response_class=HTMLResponse, tags=["frontend"])
 async def home(request: Request):
     """Home page with user search form"""
-    try:
-        users_response = await get_all_users()
-        users = users_response.Users
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "users": users
-        })
-    except Exception as e:
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "users": [],
-            "error": f"Could not load users: {str(e)}"
-        })
+    # Usernames are suggested through /api/autocomplete, not rendered up front
+    return templates.TemplateResponse("index.html", {"request": request})
 
 
 @router.post("/analyze", response_class=HTMLResponse, tags=["frontend"])
@@ -41,7 +90,7 @@ async def analyze_user(request: Request, username: str = Form(...)):
     """Analyze user's buildable sets and show results"""
     try:
         results = await analyze_user_builds(username.strip())
-        return templates.TemplateResponse("results.html", {
+        return stream_template("results.html", {
             "request": request,
             "results": results
         })
@@ -58,7 +107,7 @@ async def view_set_build(request: Request, set_id: str, username: str):
     """View detailed build requirements for a specific set"""
     try:
         build_data = await analyze_set_build(set_id, username)
-        return templates.TemplateResponse("set-build.html", {
+        return stream_template("set-build.html", {
             "request": request,
             **build_data
         })
@@ -75,9 +124,9 @@ async def view_collaboration_options(request: Request, set_id: str, username: st
     """View collaboration options for building a specific set"""
     try:
         collaboration_data = await find_collaboration_partners(username, set_id)
-        return templates.TemplateResponse("collaborate.html", {
+        return stream_template("collaborate.html", {
             "request": request,
-            **collaboration_data.dict()
+            **dict(collaboration_data)
         })
     except HTTPException as e:
         return templates.TemplateResponse("error.html", {
@@ -137,12 +186,37 @@ async def api_all_colours():
 # Brick Builder Catalogue Endpoints - Custom business logic
 # =============================================================================
 
+@router.get("/api/autocomplete", response_model=AutocompleteResponse, tags=["brick-builder-catalogue"])
+async def api_autocomplete(q: str, limit: int = Query(10, ge=1, le=50)):
+    """Suggest usernames and sets (by name or number) starting with the query"""
+    try:
+        user_index = await get_user_index()
+        set_index = await get_set_index()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Autocomplete unavailable: {str(e)}")
+    return AutocompleteResponse(
+        query=q,
+        users=search_prefix_index(user_index, q, limit),
+        sets=search_prefix_index(set_index, q, limit)
+    )
+
+
 @router.get("/api/user/{username}/builds", response_model=UserAnalysisResult, tags=["brick-builder-catalogue"])
 async def api_user_builds(username: str):
     """Analyze which sets a user can build with their inventory"""
     return await analyze_user_builds(username)
 
 
+@router.get("/api/user/{username}/build-plan", response_model=BuildPlanResult, tags=["brick-builder-catalogue"])
+async def api_user_build_plan(
+    username: str,
+    objective: Literal["sets", "pieces"] = "sets",
+    time_budget: float = Query(2.0, gt=0, le=MAX_PLAN_TIME_BUDGET)
+):
+    """Find sets a user can build at the same time, maximizing set count or total pieces"""
+    return await plan_simultaneous_builds(username, objective, time_budget)
+
+
 @router.get("/api/set/{set_id}/collaborate/{username}", response_model=CollaborationResult, tags=["brick-builder-catalogue"])
 async def api_collaboration_partners(set_id: str, username: str, max_collaborators: int = 3):
     """Find collaboration partners for building a specific set"""